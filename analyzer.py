@@ -2,13 +2,14 @@
 
 from __future__ import annotations
 
-from collections import deque
 from dataclasses import dataclass
 
 import numpy as np
+from numba import njit
+from scipy.fft import rfft
 
 
-@dataclass
+@dataclass(slots=True)
 class AnalysisState:
     bass: float
     mid: float
@@ -19,57 +20,154 @@ class AnalysisState:
     spectrum: np.ndarray
 
 
+@njit(cache=True, fastmath=True)
+def reduce_spectrum(mag, b0, b1, m0, m1, h0, h1, power_scale, nyquist):
+    """Single pass over an rfft magnitude spectrum.
+
+    Returns the mean magnitude of the bass/mid/high bin ranges, the peak
+    magnitude and an RMS volume recovered from the spectrum via Parseval.
+    ``power_scale`` undoes the FFT length and window energy; ``nyquist`` is
+    true when the last bin is the (unpaired) Nyquist bin of an even length.
+    """
+    # float32 accumulators keep the loop in single precision so it
+    # vectorises at full SIMD width; 513 bins lose nothing audible.
+    zero = np.float32(0.0)
+    bass_sum = zero
+    mid_sum = zero
+    high_sum = zero
+    peak = zero
+    power_sum = zero
+    n = mag.shape[0]
+    for i in range(n):
+        v = mag[i]
+        power_sum += v * v
+        if v > peak:
+            peak = v
+        if b0 <= i < b1:
+            bass_sum += v
+        if m0 <= i < m1:
+            mid_sum += v
+        if h0 <= i < h1:
+            high_sum += v
+    # Every bin except DC (and Nyquist) stands in for a mirrored negative bin.
+    power = 2.0 * power_sum - mag[0] * mag[0]
+    if nyquist:
+        power -= mag[n - 1] * mag[n - 1]
+    volume = np.sqrt(max(power, 0.0) * power_scale)
+    bass = bass_sum / (b1 - b0) if b1 > b0 else 0.0
+    mid = mid_sum / (m1 - m0) if m1 > m0 else 0.0
+    high = high_sum / (h1 - h0) if h1 > h0 else 0.0
+    return bass, mid, high, peak, volume
+
+
+class RollingMean:
+    """Mean over the last ``size`` values with O(1) updates."""
+
+    def __init__(self, size: int):
+        self._ring = np.zeros(size, dtype=np.float32)
+        self._idx = 0
+        self._count = 0
+        self._sum = 0.0
+
+    def push(self, value: float) -> float:
+        """Add ``value`` to the window and return the updated mean."""
+        self._sum += value - float(self._ring[self._idx])
+        self._ring[self._idx] = value
+        self._idx = (self._idx + 1) % self._ring.shape[0]
+        if self._idx == 0:
+            # Re-sum once per lap so the running total cannot drift.
+            self._sum = float(self._ring.sum())
+        self._count = min(self._count + 1, self._ring.shape[0])
+        return self._sum / self._count
+
+
 class AudioAnalyzer:
     def __init__(self, samplerate: int, blocksize: int):
         self.samplerate = samplerate
         self.blocksize = blocksize
         self.window = np.hanning(blocksize).astype(np.float32)
         self.freqs = np.fft.rfftfreq(blocksize, 1.0 / samplerate)
-
-        self.bass_hist: deque[float] = deque(maxlen=64)
-        self.high_hist: deque[float] = deque(maxlen=64)
-        self.vol_hist: deque[float] = deque(maxlen=64)
-
-    def _band_energy(self, mag: np.ndarray, low: float, high: float) -> float:
-        mask = (self.freqs >= low) & (self.freqs < high)
-        if not np.any(mask):
-            return 0.0
-        return float(np.mean(mag[mask]))
+        self._win_buf = np.empty(blocksize, dtype=np.float32)
+        self._mag_buf = np.empty(blocksize // 2 + 1, dtype=np.float32)
+        # Parseval: sum(|X|^2) / N == sum((x * w)^2) ~= mean(x^2) * sum(w^2).
+        self._power_scale = 1.0 / (blocksize * float(np.sum(self.window.astype(np.float64) ** 2)))
+        self._nyquist = blocksize % 2 == 0
+        self._mag_norm_buf = np.zeros(blocksize // 2 + 1, dtype=np.float32)
+        self._state = AnalysisState(0.0, 0.0, 0.0, 0.0, False, False, self._mag_norm_buf)
+        self.band_slices = {
+            "bass": self._band_slice(20, 180),
+            "mid": self._band_slice(180, 2000),
+            "high": self._band_slice(2000, 12000),
+        }
+
+        self.bass_hist = RollingMean(64)
+        self.high_hist = RollingMean(64)
+        self.vol_hist = RollingMean(64)
+
+    def _band_slice(self, low: float, high: float) -> tuple[int, int]:
+        """Index bounds of the FFT bins with ``low <= freq < high``."""
+        lo = int(np.searchsorted(self.freqs, low))
+        hi = int(np.searchsorted(self.freqs, high))
+        return lo, hi
+
+    def _silent_state(self) -> AnalysisState:
+        """Same result ``analyze`` gives for an all-zero frame, without the FFT."""
+        self.bass_hist.push(0.0)
+        self.high_hist.push(0.0)
+        self.vol_hist.push(0.0)
+        self._mag_norm_buf.fill(0.0)
+
+        state = self._state
+        state.bass = 0.0
+        state.mid = 0.0
+        state.high = 0.0
+        state.volume = 0.0
+        state.beat = False
+        state.treble_hit = False
+        return state
 
     def analyze(self, frame: np.ndarray) -> AnalysisState:
-        frame = np.nan_to_num(frame, copy=False)
-        frame = frame[: self.blocksize]
-        if frame.shape[0] < self.blocksize:
-            frame = np.pad(frame, (0, self.blocksize - frame.shape[0]))
-
-        windowed = frame * self.window
-        spectrum = np.fft.rfft(windowed)
-        mag = np.abs(spectrum).astype(np.float32)
-
-        bass = self._band_energy(mag, 20, 180)
-        mid = self._band_energy(mag, 180, 2000)
-        high = self._band_energy(mag, 2000, 12000)
-        volume = float(np.sqrt(np.mean(frame**2)))
-
-        self.bass_hist.append(bass)
-        self.high_hist.append(high)
-        self.vol_hist.append(volume)
+        """Analyze one audio frame.
+
+        The returned state (including its ``spectrum`` buffer) is owned by the
+        analyzer and overwritten by the next call.
+        """
+        # Window straight into the FFT input buffer; a short frame is
+        # zero-padded in place rather than through np.pad.
+        n = min(frame.shape[0], self.blocksize)
+        if n == 0 or (frame[:n].max() < 1e-6 and frame[:n].min() > -1e-6):
+            return self._silent_state()
+
+        np.multiply(frame[:n], self.window[:n], out=self._win_buf[:n])
+        self._win_buf[n:] = 0.0
+        # float32 input keeps pocketfft in single precision (complex64 out).
+        spectrum = rfft(self._win_buf, overwrite_x=True, workers=1)
+        mag = np.abs(spectrum, out=self._mag_buf)
+
+        bass, mid, high, peak, volume = reduce_spectrum(
+            mag,
+            *self.band_slices["bass"],
+            *self.band_slices["mid"],
+            *self.band_slices["high"],
+            self._power_scale,
+            self._nyquist,
+        )
 
-        bass_avg = np.mean(self.bass_hist) if self.bass_hist else bass
-        high_avg = np.mean(self.high_hist) if self.high_hist else high
+        bass_avg = self.bass_hist.push(bass)
+        high_avg = self.high_hist.push(high)
+        self.vol_hist.push(volume)
 
         beat = bass > (bass_avg * 1.55 + 1e-6)
         treble_hit = high > (high_avg * 1.65 + 1e-6)
 
-        norm = np.max(mag) + 1e-6
-        mag_norm = mag / norm
-
-        return AnalysisState(
-            bass=float(bass),
-            mid=float(mid),
-            high=float(high),
-            volume=float(volume),
-            beat=bool(beat),
-            treble_hit=bool(treble_hit),
-            spectrum=mag_norm,
-        )
+        # Peak comes out of the fused reduction; scale by its reciprocal.
+        np.multiply(mag, np.float32(1.0 / (peak + 1e-6)), out=self._mag_norm_buf)
+
+        state = self._state
+        state.bass = bass
+        state.mid = mid
+        state.high = high
+        state.volume = volume
+        state.beat = beat
+        state.treble_hit = treble_hit
+        return state
@@ -2,7 +2,6 @@
 
 from __future__ import annotations
 
-import queue
 import threading
 from dataclasses import dataclass
 from typing import Optional
@@ -24,22 +23,27 @@ class AudioInput:
 
     def __init__(self, config: AudioConfig | None = None):
         self.config = config or AudioConfig()
-        self._queue: queue.Queue[np.ndarray] = queue.Queue(maxsize=8)
+        blocksize = self.config.blocksize
+        self._mix_weights = np.full(self.config.channels, 1.0 / self.config.channels, dtype=np.float32)
+        # Single-slot handoff: the callback mixes into ``_back`` and swaps it
+        # with ``_latest`` under the lock; the consumer copies ``_latest`` out
+        # into ``_frame``. Nothing is allocated on the audio thread.
+        self._latest_lock = threading.Lock()
+        self._back = np.zeros(blocksize, dtype=np.float32)
+        self._latest = np.zeros(blocksize, dtype=np.float32)
+        self._latest_frames = 0
+        self._frame = np.zeros(blocksize, dtype=np.float32)
+        self._silence = np.zeros(blocksize, dtype=np.float32)
         self._stream: sd.InputStream | None = None
         self._running = threading.Event()
 
     def _audio_callback(self, indata, frames, time, status):
         if status:
             return
-        mono = np.mean(indata, axis=1).astype(np.float32)
-        try:
-            self._queue.put_nowait(mono)
-        except queue.Full:
-            try:
-                self._queue.get_nowait()
-            except queue.Empty:
-                pass
-            self._queue.put_nowait(mono)
+        np.dot(indata, self._mix_weights, out=self._back[:frames])
+        with self._latest_lock:
+            self._back, self._latest = self._latest, self._back
+            self._latest_frames = frames
 
     def start(self):
         if self._running.is_set():
@@ -63,14 +67,15 @@ class AudioInput:
             self._stream = None
 
     def get_latest_frame(self) -> np.ndarray:
-        """Get most recent audio frame, or silence if no frame is ready."""
-        latest = None
-        while True:
-            try:
-                latest = self._queue.get_nowait()
-            except queue.Empty:
-                break
+        """Get most recent audio frame, or silence if no frame is ready.
 
-        if latest is None:
-            return np.zeros(self.config.blocksize, dtype=np.float32)
-        return latest
+        The returned array is reused by the next call.
+        """
+        with self._latest_lock:
+            frames, self._latest_frames = self._latest_frames, 0
+            if frames:
+                self._frame[:frames] = self._latest[:frames]
+
+        if not frames:
+            return self._silence
+        return self._frame[:frames]
@@ -3,46 +3,94 @@
 from __future__ import annotations
 
 import math
-import random
-from dataclasses import dataclass
-from typing import List, Tuple
+from functools import lru_cache
+from itertools import chain, islice
+from typing import Dict, List, Tuple
 
+import numpy as np
 import pygame
 
 from analyzer import AnalysisState
+from visuals_kernels import build_hsv_lut, compute_geometry, hsv_to_rgb_u8, step_particles, step_rings
 
 Color = Tuple[int, int, int]
 
-
-@dataclass
-class Particle:
-    x: float
-    y: float
-    vx: float
-    vy: float
-    life: float
-    size: float
-    hue: float
-
-
-@dataclass
-class Ring:
-    x: float
-    y: float
-    radius: float
-    speed: float
-    life: float
-    hue: float
+MAX_PARTICLES = 1200
+MAX_RINGS = 120
+# Vertex count of the center polygon in each mode.
+POLYGON_SIDES = (6, 8, 5)
+# Length of the screen-shake noise ring; must be even.
+SHAKE_NOISE_SIZE = 1024
+
+# Circle sprites are prebuilt per (radius, hue bucket, value bucket).
+SPRITE_HUE_STEP = 15
+SPRITE_VALUE_STEP = 10
+SPRITE_HUE_BUCKETS = 360 // SPRITE_HUE_STEP
+SPRITE_VALUE_BUCKETS = 100 // SPRITE_VALUE_STEP + 1
+# Largest circle radius (screen pixels) drawn through the sprite atlas.
+SPRITE_MAX_RADIUS = 8
+
+
+@lru_cache(maxsize=4096)
+def _hsv_to_rgb_cached(h: int, s: int, v: int) -> Color:
+    return hsv_to_rgb_u8(h, s, v)
+
+
+class ParticleArrays:
+    """Fixed-capacity structure-of-arrays storage; only the first ``n`` rows are live."""
+
+    FIELDS: Tuple[str, ...] = ("x", "y", "vx", "vy", "life", "size", "hue_bucket")
+    # Columns not listed here are float32.
+    DTYPES: Dict[str, type] = {"hue_bucket": np.int8}
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.n = 0
+        self._cursor = 0
+        self.columns = tuple(np.zeros(capacity, dtype=self.DTYPES.get(name, np.float32)) for name in self.FIELDS)
+        for name, col in zip(self.FIELDS, self.columns):
+            setattr(self, name, col)
+
+    def reserve(self, amount: int) -> slice | np.ndarray:
+        """Rows to write ``amount`` (at most ``capacity``) new entries into.
+
+        New rows are appended after the live prefix while there is room. Once
+        full, the remainder overwrites live rows at a cursor that cycles through
+        them, so overflow never shifts or trims the columns.
+        """
+        n = self.n
+        free = self.capacity - n
+        if amount <= free:
+            self.n = n + amount
+            return slice(n, n + amount)
+        over = amount - free
+        rows = np.empty(amount, dtype=np.intp)
+        rows[:free] = np.arange(n, self.capacity)
+        rows[free:] = (self._cursor + np.arange(over)) % n
+        self._cursor = (self._cursor + over) % n
+        self.n = self.capacity
+        return rows
+
+
+class RingArrays(ParticleArrays):
+    FIELDS = ("x", "y", "radius", "speed", "life", "hue")
+    DTYPES = {}
 
 
 class VisualizerRenderer:
     def __init__(self, width: int, height: int):
         self.width = width
         self.height = height
-        self.center = pygame.Vector2(width / 2, height / 2)
+        self.cx = width / 2
+        self.cy = height / 2
 
-        self.particles: List[Particle] = []
-        self.rings: List[Ring] = []
+        self.particles = ParticleArrays(MAX_PARTICLES)
+        self.rings = RingArrays(MAX_RINGS)
+
+        self._rng = np.random.default_rng()
+        # Precomputed unit jitter for the screen shake, read two values a frame.
+        self._noise = self._rng.uniform(-1.0, 1.0, SHAKE_NOISE_SIZE).tolist()
+        self._noise_i = 0
 
         self.hue = 0.0
         self.bg_phase = 0.0
@@ -51,45 +99,134 @@ class VisualizerRenderer:
         self.zoom = 1.0
         self.mode_index = 0
 
-        self.trail_surface = pygame.Surface((width, height), pygame.SRCALPHA)
-        self.glow_surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        # Opaque gray multiplied over the screen to fade the previous frame.
+        self._fade_surface = pygame.Surface((width, height))
+        self._fade_surface.fill((220, 220, 220))
+        # Additive glow is drawn at reduced resolution and upscaled when
+        # composited; glow coordinates are screen coordinates / _glow_scale.
+        self._glow_scale = 2
+        self.glow_surface = pygame.Surface(
+            (max(1, width // self._glow_scale), max(1, height // self._glow_scale)), pygame.SRCALPHA
+        )
+        self._glow_full = pygame.Surface((width, height), pygame.SRCALPHA)
+        # Opaque glow-sized layer for the beat flash: a plain fill plus an
+        # add blit is far cheaper than a blended fill.
+        self._flash_surface = pygame.Surface(self.glow_surface.get_size())
+        self._hsv_luts: Dict[int, np.ndarray] = {}
+        # One widest-streak column per hue bucket; streaks crop these by width.
+        self._streak_columns = []
+        for hue_bucket in range(SPRITE_HUE_BUCKETS):
+            column = pygame.Surface((50 // self._glow_scale, self.glow_surface.get_height()))
+            column.fill(self.hsv_to_rgb(hue_bucket * SPRITE_HUE_STEP, 90, 90))
+            self._streak_columns.append(column)
+        self._sprite_max_radius = -(-SPRITE_MAX_RADIUS // self._glow_scale)
+        self._sprite_atlas = self._build_sprite_atlas(self._sprite_max_radius)
+
+        self._tunnel_i = np.arange(64, dtype=np.float32)
+        # Reused [sprite, [x, y]] blit entries: tunnel dots first, then particles.
+        self._blit_buf = [[None, [0, 0]] for _ in range(len(self._tunnel_i) + MAX_PARTICLES)]
+        self._tunnel_depth = 1 + self._tunnel_i * 0.09
+
+        self._bg_cache_key: Tuple[Color, Color] | None = None
+        self._bg_surf = pygame.Surface((1, height))
+        self._bg_t = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None]
 
     def next_mode(self):
         self.mode_index = (self.mode_index + 1) % 3
 
     @staticmethod
     def hsv_to_rgb(h: float, s: float, v: float) -> Color:
-        color = pygame.Color(0)
-        color.hsva = (h % 360, max(0, min(100, s)), max(0, min(100, v)), 100)
-        return color.r, color.g, color.b
+        # Whole-unit inputs are indistinguishable on an 8-bit display and keep
+        # most calls within a frame on the cache.
+        return _hsv_to_rgb_cached(int(h) % 360, int(s), int(v))
+
+    def hsv_to_rgb_array(self, h: np.ndarray, s: int, v: np.ndarray) -> np.ndarray:
+        """Vectorised ``hsv_to_rgb`` at a fixed saturation; returns ``(N, 3)`` uint8."""
+        lut = self._hsv_luts.get(s)
+        if lut is None:
+            lut = self._hsv_luts[s] = build_hsv_lut(s)
+        return lut[h.astype(np.int32) % 360, np.clip(v.astype(np.int32), 0, 100)]
+
+    def _build_sprite_atlas(self, max_radius: int) -> List[pygame.Surface]:
+        """Filled circle sprites matching ``pygame.draw.circle``, one per bucket.
+
+        Flat list indexed by ``((radius - 1) * hue_buckets + hue) * value_buckets + value``.
+        """
+        atlas = []
+        for radius in range(1, max_radius + 1):
+            for hue_bucket in range(SPRITE_HUE_BUCKETS):
+                for value_bucket in range(SPRITE_VALUE_BUCKETS):
+                    color = self.hsv_to_rgb(hue_bucket * SPRITE_HUE_STEP, 90, value_bucket * SPRITE_VALUE_STEP)
+                    sprite = pygame.Surface((2 * radius, 2 * radius), pygame.SRCALPHA)
+                    pygame.draw.circle(sprite, color, (radius, radius), radius)
+                    atlas.append(sprite)
+        return atlas
+
+    def _circle_blits(
+        self,
+        start: int,
+        xs: np.ndarray,
+        ys: np.ndarray,
+        radii: np.ndarray,
+        hue_buckets: np.ndarray,
+        values: np.ndarray,
+    ) -> List[list]:
+        """``blits`` sequence stamping cached circle sprites onto the glow surface.
+
+        Positions and radii are in screen space. Entries are written in place
+        into ``_blit_buf`` from row ``start`` on.
+        """
+        scale = self._glow_scale
+        # Round radii up so anything visible at full resolution stays visible.
+        radii = np.minimum((radii.astype(np.int32) + (scale - 1)) // scale, self._sprite_max_radius)
+        value_buckets = (np.clip(values, 0, 100) // SPRITE_VALUE_STEP).astype(np.int32)
+        xs = (xs / scale).astype(np.int32) - radii
+        ys = (ys / scale).astype(np.int32) - radii
+        ids = ((radii - 1) * SPRITE_HUE_BUCKETS + hue_buckets) * SPRITE_VALUE_BUCKETS + value_buckets
+
+        # Skip empty and fully off-surface circles before crossing into SDL.
+        gw, gh = self.glow_surface.get_size()
+        extent = 2 * radii
+        visible = (radii > 0) & (xs < gw) & (ys < gh) & (xs + extent > 0) & (ys + extent > 0)
+        if not visible.all():
+            ids, xs, ys = ids[visible], xs[visible], ys[visible]
+        buf = self._blit_buf
+        atlas = self._sprite_atlas
+        for entry, sprite_id, x, y in zip(islice(buf, start, None), ids.tolist(), xs.tolist(), ys.tolist()):
+            entry[0] = atlas[sprite_id]
+            dest = entry[1]
+            dest[0] = x
+            dest[1] = y
+        return buf[start : start + len(ids)]
 
     def spawn_burst(self, amount: int, bass: float):
-        for _ in range(amount):
-            angle = random.uniform(0, math.tau)
-            speed = random.uniform(2.0, 8.0) + bass * 0.01
-            self.particles.append(
-                Particle(
-                    x=self.center.x,
-                    y=self.center.y,
-                    vx=math.cos(angle) * speed,
-                    vy=math.sin(angle) * speed,
-                    life=random.uniform(0.4, 1.0),
-                    size=random.uniform(2.0, 6.0),
-                    hue=(self.hue + random.uniform(-60, 60)) % 360,
-                )
-            )
+        p = self.particles
+        amount = min(amount, p.capacity)
+        slot = p.reserve(amount)
+        # One float32 draw covers angle, speed, life, size and hue jitter.
+        u = self._rng.random((5, amount), dtype=np.float32)
+        angle = u[0] * np.float32(math.tau)
+        speed = 2.0 + 6.0 * u[1] + np.float32(bass * 0.01)
+        p.x[slot] = self.cx
+        p.y[slot] = self.cy
+        p.vx[slot] = np.cos(angle) * speed
+        p.vy[slot] = np.sin(angle) * speed
+        p.life[slot] = 0.4 + 0.6 * u[2]
+        p.size[slot] = 2.0 + 4.0 * u[3]
+        # A particle's hue never changes, so store its sprite hue bucket directly.
+        # float32 mod can round tiny negatives up to exactly 360, so wrap the bucket too.
+        hue_bucket = (np.mod(self.hue - 60.0 + 120.0 * u[4], 360) // SPRITE_HUE_STEP).astype(np.int32)
+        p.hue_bucket[slot] = hue_bucket % SPRITE_HUE_BUCKETS
 
     def spawn_ring(self, bass: float):
-        self.rings.append(
-            Ring(
-                x=self.center.x,
-                y=self.center.y,
-                radius=20 + bass * 0.04,
-                speed=3.0 + bass * 0.02,
-                life=1.0,
-                hue=self.hue,
-            )
-        )
+        r = self.rings
+        i = r.reserve(1)
+        r.x[i] = self.cx
+        r.y[i] = self.cy
+        r.radius[i] = 20 + bass * 0.04
+        r.speed[i] = 3.0 + bass * 0.02
+        r.life[i] = 1.0
+        r.hue[i] = self.hue
 
     def update(self, dt: float, state: AnalysisState):
         self.hue = (self.hue + 60 * dt + state.high * 0.002) % 360
@@ -110,128 +247,140 @@ class VisualizerRenderer:
         self.flash *= 0.82
 
         drag = max(0.7, 1.0 - dt * 2.0)
-        for p in self.particles:
-            p.x += p.vx
-            p.y += p.vy
-            p.vx *= drag
-            p.vy *= drag
-            p.life -= dt * 0.9
-            p.size *= 0.995
-        self.particles = [p for p in self.particles if p.life > 0 and p.size > 0.5]
-
-        for r in self.rings:
-            r.radius += r.speed + state.bass * 0.003
-            r.life -= dt * 0.55
-        self.rings = [r for r in self.rings if r.life > 0]
-
-        if len(self.particles) > 1200:
-            self.particles = self.particles[-1200:]
-        if len(self.rings) > 120:
-            self.rings = self.rings[-120:]
-
-    def _draw_background(self, screen: pygame.Surface, state: AnalysisState, offset: pygame.Vector2):
+        p = self.particles
+        p.n = step_particles(p.x, p.y, p.vx, p.vy, p.life, p.size, p.hue_bucket, p.n, drag, dt * 0.9)
+        r = self.rings
+        r.n = step_rings(r.x, r.y, r.radius, r.speed, r.life, r.hue, r.n, state.bass * 0.003, dt * 0.55)
+
+    def _draw_background(self, screen: pygame.Surface, state: AnalysisState, sx: float, sy: float):
         mid_inf = min(1.0, state.mid * 0.003)
         high_inf = min(1.0, state.high * 0.004)
         c1 = self.hsv_to_rgb(self.hue + 30 * math.sin(self.bg_phase), 70 + 20 * high_inf, 9 + 20 * mid_inf)
         c2 = self.hsv_to_rgb(self.hue + 160 + 40 * math.cos(self.bg_phase * 1.2), 75, 8 + 24 * high_inf)
 
-        for y in range(0, self.height, 4):
-            t = y / max(1, self.height - 1)
-            r = int(c1[0] * (1 - t) + c2[0] * t)
-            g = int(c1[1] * (1 - t) + c2[1] * t)
-            b = int(c1[2] * (1 - t) + c2[2] * t)
-            pygame.draw.rect(screen, (r, g, b), (offset.x, y + offset.y, self.width, 4))
-
-    def _draw_spectrum_tunnel(self, screen: pygame.Surface, state: AnalysisState, offset: pygame.Vector2):
+        # The gradient only depends on the two end colors, which change slowly.
+        if (c1, c2) != self._bg_cache_key:
+            self._bg_cache_key = (c1, c2)
+            t = self._bg_t
+            rgb = np.asarray(c1, dtype=np.float32) * (1 - t) + np.asarray(c2, dtype=np.float32) * t
+            pygame.surfarray.blit_array(self._bg_surf, rgb.astype(np.uint8)[None])
+        # Stretch the strip straight into the (shake-offset) screen region it
+        # covers, instead of scaling into a temporary and blitting that.
+        dest = pygame.Rect(int(sx), int(sy), self.width, self.height).clip(screen.get_rect())
+        if dest.w and dest.h:
+            strip = self._bg_surf.subsurface((0, dest.y - int(sy), 1, dest.h))
+            pygame.transform.scale(strip, dest.size, screen.subsurface(dest))
+
+    def _tunnel_blits(self, state: AnalysisState, sx: float, sy: float):
         bins = min(128, len(state.spectrum))
-        spec = state.spectrum[:bins]
-        base_radius = min(self.width, self.height) * 0.18
-        for i, amp in enumerate(spec[::2]):
-            angle = (i / (bins / 2)) * math.tau + self.bg_phase * 0.4
-            depth = 1 + i * 0.09
-            radius = base_radius * depth * self.zoom
-            pulse = amp * 220 + state.bass * 0.005
-            x = self.center.x + math.cos(angle) * (radius + pulse) + offset.x
-            y = self.center.y + math.sin(angle) * (radius + pulse) + offset.y
-            color = self.hsv_to_rgb(self.hue + i * 4, 90, 35 + amp * 70)
-            pygame.draw.circle(self.glow_surface, (*color, 65), (int(x), int(y)), int(2 + amp * 5))
-
-    def _draw_geometry(self, screen: pygame.Surface, state: AnalysisState, offset: pygame.Vector2):
+        amp = state.spectrum[:bins:2]
+        count = amp.shape[0]
+        i = self._tunnel_i[:count]
+        angle = i * (math.tau / (bins / 2)) + self.bg_phase * 0.4
+        dist = self._tunnel_depth[:count] * (min(self.width, self.height) * 0.18 * self.zoom)
+        dist += amp * 220 + state.bass * 0.005
+        return self._circle_blits(
+            0,
+            np.cos(angle) * dist + (self.cx + sx),
+            np.sin(angle) * dist + (self.cy + sy),
+            2 + amp * 5,
+            (np.mod(self.hue + i * 4, 360) // SPRITE_HUE_STEP).astype(np.int32) % SPRITE_HUE_BUCKETS,
+            35 + amp * 70,
+        )
+
+    def _draw_geometry(self, screen: pygame.Surface, state: AnalysisState, sx: float, sy: float):
         bass_scale = 1.0 + min(1.4, state.bass * 0.006)
         size = min(self.width, self.height) * 0.11 * bass_scale * self.zoom
-        points = []
-        count = 6 if self.mode_index == 0 else 8 if self.mode_index == 1 else 5
-        for i in range(count):
-            angle = (i / count) * math.tau + self.bg_phase * (0.7 + self.mode_index * 0.25)
-            radius = size * (1 + 0.3 * math.sin(self.bg_phase * 2 + i))
-            points.append(
-                (
-                    self.center.x + math.cos(angle) * radius + offset.x,
-                    self.center.y + math.sin(angle) * radius + offset.y,
-                )
-            )
+        points = compute_geometry(
+            POLYGON_SIDES[self.mode_index], self.bg_phase, self.mode_index, size, self.cx, self.cy, sx, sy
+        ).tolist()
         color = self.hsv_to_rgb(self.hue + 50, 95, 80)
         pygame.draw.polygon(screen, color, points, width=3)
 
-    def _draw_rings(self, screen: pygame.Surface, offset: pygame.Vector2):
-        for r in self.rings:
-            color = self.hsv_to_rgb(r.hue, 90, 80 * r.life)
+    def _streak_blits(self):
+        """Eight random full-height glitch streaks, cropped from prebuilt color columns."""
+        scale = self._glow_scale
+        height = self.glow_surface.get_height()
+        rng = self._rng
+        xs = rng.integers(0, self.width, 8, endpoint=True) // scale
+        widths = rng.integers(10, 50, 8, endpoint=True) // scale
+        buckets = (self.hue + rng.integers(0, 120, 8, endpoint=True)).astype(np.int32) % 360 // SPRITE_HUE_STEP
+        columns = self._streak_columns
+        return [
+            (columns[b], (x, 0), (0, 0, w, height))
+            for x, w, b in zip(xs.tolist(), widths.tolist(), buckets.tolist())
+        ]
+
+    def _draw_rings(self, screen: pygame.Surface, sx: float, sy: float):
+        r = self.rings
+        n = r.n
+        scale = self._glow_scale
+        xs = r.x[:n] + sx
+        ys = r.y[:n] + sy
+        radii = r.radius[:n]
+        # A ring outline is off-screen once it encloses every corner or lies
+        # entirely beyond an edge.
+        far = np.hypot(np.maximum(xs, self.width - xs), np.maximum(ys, self.height - ys))
+        near = np.hypot(
+            np.maximum(np.abs(xs - self.width / 2) - self.width / 2, 0),
+            np.maximum(np.abs(ys - self.height / 2) - self.height / 2, 0),
+        )
+        visible = (radii <= far) & (radii >= near)
+        colors = self.hsv_to_rgb_array(r.hue[:n][visible], 90, 80 * r.life[:n][visible])
+        for x, y, radius, color in zip(
+            xs[visible].tolist(),
+            ys[visible].tolist(),
+            radii[visible].tolist(),
+            colors.tolist(),
+        ):
             pygame.draw.circle(
                 self.glow_surface,
-                (*color, int(100 * r.life)),
-                (int(r.x + offset.x), int(r.y + offset.y)),
-                int(r.radius),
-                width=2,
+                color,
+                (int(x / scale), int(y / scale)),
+                int(radius / scale),
+                width=max(1, 2 // scale),
             )
 
-    def _draw_particles(self, offset: pygame.Vector2):
-        for p in self.particles:
-            v = min(100, 20 + p.life * 80)
-            color = self.hsv_to_rgb(p.hue, 90, v)
-            pygame.draw.circle(
-                self.glow_surface,
-                (*color, int(220 * p.life)),
-                (int(p.x + offset.x), int(p.y + offset.y)),
-                int(p.size),
-            )
+    def _particle_blits(self, sx: float, sy: float):
+        p = self.particles
+        n = p.n
+        return self._circle_blits(
+            len(self._tunnel_i),
+            p.x[:n] + sx,
+            p.y[:n] + sy,
+            p.size[:n],
+            p.hue_bucket[:n],
+            20 + p.life[:n] * 80,
+        )
 
     def render(self, screen: pygame.Surface, state: AnalysisState):
-        shake_vec = pygame.Vector2(
-            random.uniform(-self.shake, self.shake),
-            random.uniform(-self.shake, self.shake),
-        )
+        i = self._noise_i
+        sx = self._noise[i] * self.shake
+        sy = self._noise[i + 1] * self.shake
+        self._noise_i = (i + 2) % SHAKE_NOISE_SIZE
 
-        self.trail_surface.fill((0, 0, 0, 35))
-        screen.blit(self.trail_surface, (0, 0))
-        self._draw_background(screen, state, shake_vec)
+        # Same decay as compositing black at alpha 35 (255 - 35 = 220), but as
+        # a multiply blit from a surface that is never refilled.
+        screen.blit(self._fade_surface, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+        self._draw_background(screen, state, sx, sy)
 
         self.glow_surface.fill((0, 0, 0, 0))
 
-        if self.mode_index == 0:
-            self._draw_spectrum_tunnel(screen, state, shake_vec)
-            self._draw_geometry(screen, state, shake_vec)
-        elif self.mode_index == 1:
-            self._draw_geometry(screen, state, shake_vec)
-            self._draw_spectrum_tunnel(screen, state, shake_vec)
-        else:
-            self._draw_spectrum_tunnel(screen, state, shake_vec)
-            self._draw_geometry(screen, state, shake_vec)
-            if state.beat:
-                for _ in range(8):
-                    x = random.randint(0, self.width)
-                    w = random.randint(10, 50)
-                    col = self.hsv_to_rgb(self.hue + random.randint(0, 120), 90, 90)
-                    pygame.draw.rect(self.glow_surface, (*col, 60), (x, 0, w, self.height))
-
-        self._draw_rings(screen, shake_vec)
-        self._draw_particles(shake_vec)
+        self._draw_geometry(screen, state, sx, sy)
+        self._draw_rings(screen, sx, sy)
+
+        # Every sprite layer of the glow pass goes out in a single blits call;
+        # only the ring outlines above are still drawn primitive by primitive.
+        layers = [self._tunnel_blits(state, sx, sy)]
+        if self.mode_index == 2 and state.beat:
+            layers.append(self._streak_blits())
+        layers.append(self._particle_blits(sx, sy))
+        self.glow_surface.blits(chain.from_iterable(layers), doreturn=False)
 
         if self.flash > 1:
             flash_col = self.hsv_to_rgb(self.hue + 180, 40, min(100, self.flash * 0.5))
-            pygame.draw.rect(
-                self.glow_surface,
-                (*flash_col, int(min(180, self.flash))),
-                (0, 0, self.width, self.height),
-            )
+            self._flash_surface.fill(flash_col)
+            self.glow_surface.blit(self._flash_surface, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
 
-        screen.blit(self.glow_surface, (0, 0), special_flags=pygame.BLEND_ADD)
+        pygame.transform.scale(self.glow_surface, (self.width, self.height), self._glow_full)
+        screen.blit(self._glow_full, (0, 0), special_flags=pygame.BLEND_ADD)